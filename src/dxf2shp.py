@@ -7,13 +7,24 @@ DXF -> SHP converter
 - CPG file is written with UTF-8 if missing for correct attribute encoding
 """
 import os
+import io
+import sys
+import time
+import struct
+import itertools
+import contextlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import shapefile  # pyshp
 import ezdxf
 from ezdxf import colors as ezcolors
+from ezdxf.addons import iterdxf
 
 INPUT_DIR = os.path.join(".", "Files2Convert")
 OUTPUT_DIR = os.path.join(".", "ConvertedDXF2SHP")
 DBF_CPG = "UTF-8"
+ENTITY_TYPES = ("POINT", "LINE", "LWPOLYLINE", "POLYLINE")
 
 
 def ensure_dir(path: str) -> None:
@@ -40,63 +51,166 @@ def get_line_xy(e):
 
 
 def lwpolyline_xy(e):
-    pts = []
+    """Return LWPOLYLINE vertices as an (N, 2) float64 array."""
+    lwpoints = getattr(e, "lwpoints", None)
+    values = getattr(lwpoints, "values", None)
+    if values is not None:
+        # Packed (x, y, start_width, end_width, bulge) rows; view, no copy
+        size = getattr(lwpoints, "VERTEX_SIZE", 5)
+        return np.frombuffer(values, dtype=np.float64).reshape(-1, size)[:, :2]
     gp = getattr(e, "get_points", None)
     if callable(gp):
         try:
-            for x, y in gp("xy"):
-                pts.append((float(x), float(y)))
-            return pts
+            pts = gp("xy")
         except TypeError:
-            for p in gp():
-                pts.append((float(p[0]), float(p[1])))
-            return pts
-    if isinstance(gp, (list, tuple)):
-        for p in gp:
-            pts.append((float(p[0]), float(p[1])))
-        return pts
-    try:
-        for p in e:
-            pts.append((float(p[0]), float(p[1])))
-        return pts
-    except Exception:
-        pass
-    raise ValueError("Unsupported LWPOLYLINE point format for this ezdxf version.")
-
-
-def polyline_xy(e):
-    pts = []
-    verts_attr = getattr(e, "vertices", None)
-    if callable(verts_attr):
-        it = verts_attr()
-    elif isinstance(verts_attr, (list, tuple)):
-        it = verts_attr
+            pts = [(p[0], p[1]) for p in gp()]
+    elif isinstance(gp, (list, tuple)):
+        pts = [(p[0], p[1]) for p in gp]
     else:
-        it = []
-    for v in it:
-        d = getattr(v, "dxf", v)
-        loc = getattr(d, "location", None)
-        if loc is not None:
-            pts.append((float(getattr(loc, "x", 0.0)), float(getattr(loc, "y", 0.0))))
-        else:
-            x = float(getattr(d, "x", 0.0))
-            y = float(getattr(d, "y", 0.0))
-            pts.append((x, y))
-    return pts
+        try:
+            pts = [(p[0], p[1]) for p in e]
+        except Exception:
+            raise ValueError("Unsupported LWPOLYLINE point format for this ezdxf version.")
+    return np.asarray(pts, dtype=np.float64).reshape(-1, 2)
 
 
-def is_closed(e) -> bool:
-    v = getattr(e, "closed", None)
-    if isinstance(v, bool):
-        return v
-    v = getattr(e, "is_closed", None)
-    if isinstance(v, bool):
-        return v
-    return False
+def polyline_xy(e):
+    """Return POLYLINE vertex locations as an (N, 2) float64 array."""
+    flat = itertools.chain.from_iterable(e.points())
+    return np.fromiter(flat, dtype=np.float64).reshape(-1, 3)[:, :2]
 
 
 def close_if_needed(pts):
-    return pts + [pts[0]] if pts and pts[0] != pts[-1] else pts
+    arr = np.asarray(pts, dtype=np.float64).reshape(-1, 2)
+    if len(arr) and not np.array_equal(arr[0], arr[-1]):
+        return np.vstack([arr, arr[:1]])
+    return arr
+
+
+# Shapefile record layout: big-endian record header, little-endian content
+_SHP_REC_HEADER = struct.Struct(">2i")
+_SHP_POLY_HEADER = struct.Struct("<i4d2i")
+_SHP_POINT_REC = np.dtype([
+    ("num", ">i4"), ("length", ">i4"), ("type", "<i4"), ("x", "<f8"), ("y", "<f8"),
+])
+
+
+class BufferedShapeWriter:
+    """
+    Minimal stand-in for shapefile.Writer (POINT, POLYLINE, POLYGON with 'C' fields).
+    Shapes and records are only collected while converting; close() packs the
+    .shp/.shx/.dbf bytes in bulk and writes each file with a single call,
+    byte-compatible with what pyshp would produce.
+    """
+
+    def __init__(self, target: str, shapeType: int):
+        self.base = os.path.splitext(target)[0]
+        self.shapeType = shapeType
+        self.fields = []
+        self.shapes = []
+        self.records = []
+
+    def field(self, name: str, fieldType: str = "C", size: int = 50, decimal: int = 0):
+        if fieldType != "C":
+            raise ValueError(f"Only character fields are supported, got '{fieldType}'.")
+        self.fields.append((name, int(size)))
+
+    def point(self, x, y):
+        self.shapes.append((x, y))
+
+    def line(self, lines):
+        self.shapes.append([np.array(part, dtype=np.float64).reshape(-1, 2) for part in lines])
+
+    def poly(self, polys):
+        # Rings are expected closed already (see close_if_needed)
+        self.line(polys)
+
+    def record(self, *values):
+        self.records.append(values)
+
+    def close(self):
+        if len(self.shapes) != len(self.records):
+            raise ValueError(
+                f"{len(self.records)} records do not match {len(self.shapes)} shapes."
+            )
+        if self.shapeType == shapefile.POINT:
+            shp, shx_index, bbox = self._pack_points()
+        else:
+            shp, shx_index, bbox = self._pack_parts()
+        shp_header = self._header(50 + len(shp) // 2, bbox)
+        shx_header = self._header(50 + len(self.shapes) * 4, bbox)
+        with open(self.base + ".shp", "wb") as f:
+            f.write(shp_header + shp)
+        with open(self.base + ".shx", "wb") as f:
+            f.write(shx_header + shx_index.tobytes())
+        with open(self.base + ".dbf", "wb") as f:
+            f.write(self._pack_dbf())
+
+    def _header(self, length_words: int, bbox) -> bytes:
+        return (
+            struct.pack(">7i", 9994, 0, 0, 0, 0, 0, length_words)
+            + struct.pack("<2i4d4d", 1000, self.shapeType, *bbox, 0, 0, 0, 0)
+        )
+
+    def _pack_points(self):
+        xy = np.array(self.shapes, dtype=np.float64).reshape(-1, 2)
+        n = len(xy)
+        recs = np.empty(n, dtype=_SHP_POINT_REC)
+        recs["num"] = np.arange(1, n + 1)
+        recs["length"] = 10  # type + x + y, in 16-bit words
+        recs["type"] = self.shapeType
+        recs["x"] = xy[:, 0]
+        recs["y"] = xy[:, 1]
+        offsets = 50 + 14 * np.arange(n)
+        shx_index = np.column_stack([offsets, np.full(n, 10)]).astype(">i4")
+        lo, hi = xy.min(axis=0), xy.max(axis=0)
+        return recs.tobytes(), shx_index, (lo[0], lo[1], hi[0], hi[1])
+
+    def _pack_parts(self):
+        chunks = []
+        shx_index = np.empty((len(self.shapes), 2), dtype=">i4")
+        offset = 50
+        lo = np.full(2, np.inf)
+        hi = np.full(2, -np.inf)
+        for i, parts in enumerate(self.shapes):
+            pts = parts[0] if len(parts) == 1 else np.concatenate(parts)
+            if not len(pts):
+                raise ValueError(f"Shape {i + 1} has no points.")
+            starts = np.cumsum([0] + [len(p) for p in parts[:-1]], dtype="<i4")
+            smin, smax = pts.min(axis=0), pts.max(axis=0)
+            lo = np.minimum(lo, smin)
+            hi = np.maximum(hi, smax)
+            # type + bbox + counts + part starts + points, in 16-bit words
+            length = (44 + 4 * len(parts) + 16 * len(pts)) // 2
+            chunks.append(_SHP_REC_HEADER.pack(i + 1, length))
+            chunks.append(_SHP_POLY_HEADER.pack(
+                self.shapeType, smin[0], smin[1], smax[0], smax[1], len(parts), len(pts)
+            ))
+            chunks.append(starts.tobytes())
+            chunks.append(pts.astype("<f8", copy=False).tobytes())
+            shx_index[i] = offset, length
+            offset += 4 + length
+        return b"".join(chunks), shx_index, (lo[0], lo[1], hi[0], hi[1])
+
+    def _pack_dbf(self) -> bytes:
+        year, month, day = time.localtime()[:3]
+        record_length = 1 + sum(size for _, size in self.fields)
+        parts = [struct.pack(
+            "<4BI2H20x", 3, year - 1900, month, day, len(self.records),
+            33 + 32 * len(self.fields), record_length,
+        )]
+        for name, size in self.fields:
+            fname = name.encode("utf-8").replace(b" ", b"_")[:10].ljust(11, b"\x00")
+            parts.append(struct.pack("<11sc4xBB14x", fname, b"C", size, 0))
+        parts.append(b"\r")
+        sizes = [size for _, size in self.fields]
+        parts.extend(
+            b" " + b"".join(
+                str(v).encode("utf-8")[:size].ljust(size) for v, size in zip(rec, sizes)
+            )
+            for rec in self.records
+        )
+        return b"".join(parts)
 
 
 class WriterSet:
@@ -110,14 +224,13 @@ class WriterSet:
     def _init(self, kind: str):
         path = f"{self.base}_{kind}"
         if kind == "points":
-            w = shapefile.Writer(path, shapeType=shapefile.POINT)
+            w = BufferedShapeWriter(path, shapeType=shapefile.POINT)
         elif kind == "lines":
-            w = shapefile.Writer(path, shapeType=shapefile.POLYLINE)
+            w = BufferedShapeWriter(path, shapeType=shapefile.POLYLINE)
         elif kind == "polygons":
-            w = shapefile.Writer(path, shapeType=shapefile.POLYGON)
+            w = BufferedShapeWriter(path, shapeType=shapefile.POLYGON)
         else:
             raise ValueError(kind)
-        w.autoBalance = 1
         # Attributes
         w.field("layer", "C", size=64)
         w.field("etype", "C", size=16)
@@ -141,17 +254,56 @@ class WriterSet:
                     write_cpg_if_missing(f"{self.base}_{kind}")
 
 
+def _stream_entities(src):
+    try:
+        yield from src.modelspace(types=ENTITY_TYPES)
+    finally:
+        src.close()
+
+
+def open_modelspace(dxf_path: str):
+    """
+    Returns (layers, entities): the LAYER table entries and an iterator over the
+    modelspace entities of ENTITY_TYPES.
+    ASCII DXF is streamed entity by entity via ezdxf's iterdxf add-on, so the full
+    document is never built; files it cannot index (e.g. binary DXF) are read whole.
+    """
+    try:
+        src = iterdxf.opendxf(dxf_path)
+    except ezdxf.DXFError:
+        doc = ezdxf.readfile(dxf_path)
+        return list(doc.layers), doc.modelspace().query(" ".join(ENTITY_TYPES))
+    try:
+        layers = []
+        if "TABLES" in src.sections:
+            layers = list(src.load_entities(src.sections["TABLES"] + 1, {"LAYER"}))
+    except Exception:
+        src.close()
+        raise
+    return layers, _stream_entities(src)
+
+
 def convert_one_dxf(dxf_path: str, out_dir: str) -> None:
     name = os.path.splitext(os.path.basename(dxf_path))[0]
     base_out = os.path.join(out_dir, name)
     print(f"Converting '{dxf_path}' -> '{base_out}_*.shp' ...")
 
-    doc = ezdxf.readfile(dxf_path)
-    msp = doc.modelspace()
-    entities = msp.query("POINT LINE LWPOLYLINE POLYLINE")
+    layers, entities = open_modelspace(dxf_path)
 
     writers = WriterSet(base_out)
 
+    # ACI and layer colors repeat across entities; resolve each only once
+    aci_rgb = {i: tuple(int(c) for c in ezcolors.aci2rgb(i)) for i in range(1, 256)}
+
+    def layer_color_rgb(layer_obj) -> tuple:
+        try:
+            return aci_rgb[int(layer_obj.color or 7)]
+        except Exception:
+            return 0, 0, 0
+
+    # Layer table lookups are case-insensitive, so key by lower-cased name
+    layer_rgb = {lay.dxf.name.lower(): layer_color_rgb(lay) for lay in layers}
+
     def entity_rgb(ent) -> tuple:
         """Get RGB for an entity: prefer true_color, then entity ACI, then layer ACI."""
         d = ent.dxf
@@ -162,23 +314,22 @@ def convert_one_dxf(dxf_path: str, out_dir: str) -> None:
         # 2) explicit entity ACI (1..255), 256=ByLayer, 0=ByBlock
         aci = int(getattr(d, "color", 256) or 256)
         if aci not in (0, 256):
-            r, g, b = ezcolors.aci2rgb(aci)
-            return int(r), int(g), int(b)
-        # 3) layer color
+            return aci_rgb[aci]
+        # 3) layer color, fallback black for unknown layers
         lay = getattr(d, "layer", None) or "0"
-        try:
-            layer_obj = doc.layers.get(lay)
-            r, g, b = ezcolors.aci2rgb(int(layer_obj.color or 7))
-            return int(r), int(g), int(b)
-        except Exception:
-            # Fallback black
-            return 0, 0, 0
+        return layer_rgb.get(lay.lower(), (0, 0, 0))
+
+    # (R, G, B) -> "rgb(R,G,B)"; only a handful of distinct colors per drawing
+    rgb_text_cache = {}
 
     for e in entities:
         et = e.dxftype()
         layer = getattr(e.dxf, "layer", "")
-        R, G, B = entity_rgb(e)
-        rgb_text = f"rgb({R},{G},{B})"
+        rgb = entity_rgb(e)
+        rgb_text = rgb_text_cache.get(rgb)
+        if rgb_text is None:
+            R, G, B = rgb
+            rgb_text = rgb_text_cache[rgb] = f"rgb({R},{G},{B})"
 
         if et == "POINT":
             x, y = get_point_xy(e)
@@ -196,7 +347,7 @@ def convert_one_dxf(dxf_path: str, out_dir: str) -> None:
 
         elif et == "LWPOLYLINE":
             pts = lwpolyline_xy(e)
-            if is_closed(e) and len(pts) >= 3:
+            if e.closed and len(pts) >= 3:
                 w = writers.get("polygons")
                 w.poly([close_if_needed(pts)])
                 w.record(layer, et, rgb_text)
@@ -209,7 +360,7 @@ def convert_one_dxf(dxf_path: str, out_dir: str) -> None:
 
         elif et == "POLYLINE":
             pts = polyline_xy(e)
-            if is_closed(e) and len(pts) >= 3:
+            if e.is_closed and len(pts) >= 3:
                 w = writers.get("polygons")
                 w.poly([close_if_needed(pts)])
                 w.record(layer, et, rgb_text)
@@ -228,6 +379,19 @@ def convert_one_dxf(dxf_path: str, out_dir: str) -> None:
     )
 
 
+def _convert_one(dxf_path: str, out_dir: str) -> str:
+    """Process pool worker: convert one DXF and return its captured console output."""
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        try:
+            convert_one_dxf(dxf_path, out_dir)
+        except Exception as e:
+            print(f"Failed to convert '{os.path.basename(dxf_path)}'. Error: {e}")
+            traceback.print_exc(file=buf)
+            print()
+    return buf.getvalue()
+
+
 def convert_all():
     if not os.path.isdir(INPUT_DIR):
         print(f"Input directory '{INPUT_DIR}' does not exist.")
@@ -237,18 +401,21 @@ def convert_all():
         print(f"Failed to create output directory '{OUTPUT_DIR}'.")
         return
     print(f"Output directory: {OUTPUT_DIR}")
-    for fn in os.listdir(INPUT_DIR):
-        if fn.lower().endswith(".dxf"):
-            dxf_path = os.path.join(INPUT_DIR, fn)
-            try:
-                convert_one_dxf(dxf_path, OUTPUT_DIR)
-            except Exception as e:
-                import traceback
-                print(f"Failed to convert '{fn}'. Error: {e}")
-                traceback.print_exc()
-                print()
+    with os.scandir(INPUT_DIR) as it:
+        paths = [
+            entry.path
+            for entry in it
+            if entry.is_file() and entry.name.lower().endswith(".dxf")
+        ]
+    if paths:
+        # Files are independent and CPU-bound; one process per core sidesteps the GIL
+        with ProcessPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as ex:
+            sys.stdout.writelines(ex.map(_convert_one, paths, itertools.repeat(OUTPUT_DIR)))
     print("All conversions completed.")
 
 
 if __name__ == "__main__":
+    # Block-buffer console output; per-file logs are written in bulk, not line by line
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
     convert_all()
@@ -121,6 +121,10 @@ def build_options() -> List[Tuple[str, str, str]]:
 # Parsing user input
 # --------------------------
 
+_RE_WGS_UTM = re.compile(r"(WGS|WGS84)/UTM(\d{2})N?")
+_RE_EUREF_UTM = re.compile(r"((EUREF89|ETRS89)/)?UTM(\d{2})N?")
+_RE_NTM = re.compile(r"NTM/(\d{1,2})")
+
 def parse_choice(s: str, options: List[Tuple[str, str, str]]) -> Tuple[str, str]:
     """
     Returns (label, wkt) for the chosen CRS. Accepts:
@@ -145,21 +149,21 @@ def parse_choice(s: str, options: List[Tuple[str, str, str]]) -> Tuple[str, str]
 
     # Enforce WGS prefix for WGS UTM:
     # - Accept 'WGS/UTMxx' or 'WGS84/UTMxx' for WGS84
-    m = re.fullmatch(r"(WGS|WGS84)/UTM(\d{2})N?", t)
+    m = _RE_WGS_UTM.fullmatch(t)
     if m:
         zone = int(m.group(2))
         name, wkt = wkt_utm_wgs84(zone)
         return f"{name} (WKT built)", wkt
 
     # Default UTM -> EUREF89 (and allow explicit EUREF89/UTMxx too)
-    m = re.fullmatch(r"((EUREF89|ETRS89)/)?UTM(\d{2})N?", t)
+    m = _RE_EUREF_UTM.fullmatch(t)
     if m:
         zone = int(m.group(3))
         name, wkt = wkt_utm_euref89(zone)
         return f"{name} (WKT built)", wkt
 
     # NTM zones (EUREF89)
-    m = re.fullmatch(r"NTM/(\d{1,2})", t)
+    m = _RE_NTM.fullmatch(t)
     if m:
         zone = int(m.group(1))
         if not (5 <= zone <= 20):
@@ -172,64 +176,34 @@ def parse_choice(s: str, options: List[Tuple[str, str, str]]) -> Tuple[str, str]
         "'WGS/UTM32' or 'WGS84/UTM32' (WGS), 'EUREF89/UTM35', or 'NTM/10'."
     )
 
-    """
-    Returns (label, wkt) for the chosen CRS. Accepts:
-      - integer index into options (1-based)
-      - tokens like 'UTM33', 'WGS84/UTM32', 'EUREF89/UTM35', or 'NTM/10'
-      - Backward compatibility: also accepts 'ETRS89/UTM33'
-    """
-    s = s.strip()
-    # 1) Numeric index
-    if s.isdigit():
-        idx = int(s)
-        if 1 <= idx <= len(options):
-            label, _, wkt = options[idx - 1]
-            return label, wkt
-        raise ValueError("Index out of range.")
-
-    # 2) Text keys
-    t = s.upper().replace(" ", "")
-    # Normalize variants: 'UTM33' -> assume EUREF89 unless WGS84 specified
-    m = re.fullmatch(r"((EUREF89|ETRS89)/)?UTM(\d{2})N?", t)
-    if m:
-        zone = int(m.group(3))
-        # If WGS84 explicitly requested elsewhere, that path is handled below
-        name, wkt = wkt_utm_euref89(zone)
-        return f"{name} (WKT built)", wkt
-
-    m = re.fullmatch(r"WGS84/UTM(\d{2})N?", t)
-    if m:
-        zone = int(m.group(1))
-        name, wkt = wkt_utm_wgs84(zone)
-        return f"{name} (WKT built)", wkt
-
-    m = re.fullmatch(r"NTM/(\d{1,2})", t)
-    if m:
-        zone = int(m.group(1))
-        if not (5 <= zone <= 20):
-            raise ValueError("NTM zone must be 5–20 for mainland Norway.")
-        name, wkt = wkt_ntm(zone)
-        return f"{name} (WKT built)", wkt
-
-    raise ValueError("Unrecognized input. Use index (1..N), 'UTM33', 'WGS84/UTM32', 'EUREF89/UTM35', or 'NTM/10'.")
-
 # --------------------------
 # Writing .prj / .cpg
 # --------------------------
 
-def write_sidecars(shp_path: str, wkt: str) -> None:
+# O_BINARY keeps Windows from translating "\n"; it does not exist (and is not needed) elsewhere
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+def _write_bytes(path: str, data: bytes) -> None:
+    # Plain fd write: skips the TextIOWrapper/BufferedWriter stack for tiny files
+    fd = os.open(path, _WRITE_FLAGS, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+
+def write_sidecars(shp_path: str, wkt: str) -> str:
+    """Writes <base>.prj and <base>.cpg next to shp_path; returns a log line for the caller."""
     base, _ = os.path.splitext(shp_path)
     prj_path = base + ".prj"
     cpg_path = base + ".cpg"
-    with open(prj_path, "w", encoding="utf-8") as f:
-        f.write(wkt + "\n")
+    _write_bytes(prj_path, (wkt + "\n").encode("utf-8"))
     # .cpg to mark DBF encoding
-    with open(cpg_path, "w", encoding="ascii", newline="") as f:
-        f.write(CPG_CONTENT)
-    print(f"  wrote: {os.path.basename(prj_path)}, {os.path.basename(cpg_path)}")
+    _write_bytes(cpg_path, CPG_CONTENT.encode("ascii"))
+    return f"  wrote: {os.path.basename(prj_path)}, {os.path.basename(cpg_path)}"
 
 def find_shapefiles(folder: str) -> List[str]:
-    return [os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(".shp")]
+    with os.scandir(folder) as it:
+        return [e.path for e in it if e.is_file() and e.name.lower().endswith(".shp")]
 
 # --------------------------
 # Main
@@ -264,13 +238,18 @@ def main():
         print("No .shp files found. Exiting.")
         sys.exit(0)
 
+    # Collect per-file lines and emit them in one write
+    logs: List[str] = []
     for shp in shp_files:
         try:
-            write_sidecars(shp, wkt)
+            logs.append(write_sidecars(shp, wkt))
         except Exception as e:
-            print(f"  FAILED for {os.path.basename(shp)}: {e}")
-
-    print("\nDone.")
+            logs.append(f"  FAILED for {os.path.basename(shp)}: {e}")
+    logs.append("\nDone.\n")
+    sys.stdout.write("\n".join(logs))
 
 if __name__ == "__main__":
+    # Block-buffered console; input() still flushes the menu before prompting
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
     main()
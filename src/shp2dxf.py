@@ -8,28 +8,79 @@ SHP -> DXF converter
 - Writes DXF true_color (exact RGB). If a 'layer' attribute exists it is applied to the entity.
 """
 import os
+import io
+import sys
+import re
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import shapefile
 import ezdxf
 from ezdxf import colors as ezcolors
 
 
+# 'rgb(R,G,B)' as written by dxf2shp; case-insensitive, spaces allowed around numbers
+_RGB_TEXT_RE = re.compile(r"rgb\(\s*(\d{1,3})\s*,\s*(\d{1,3})\s*,\s*(\d{1,3})\s*\)", re.IGNORECASE)
+
+# Lower-cased DBF field names read for layer (see _convert_one) and color (see _rgb_field_indices)
+_ATTRIBUTE_FIELDS = frozenset((
+    "layer", "rgb_text", "r", "g", "b", "color", "colour", "clr", "aci", "autocadcolorindex",
+))
+
+
 def _split_parts(shape):
     """
     Yield parts for polyline/polygon shapes.
-    Each part is a list of (x, y) tuples.
+    Each part is an (N, 2) float64 array view into the shape's points.
     """
-    pts = shape.points
+    pts = np.asarray(shape.points, dtype=np.float64).reshape(-1, 2)
     parts = getattr(shape, "parts", [0])
     # parts is a list of starting indices; add end sentinel
-    idxs = list(parts) + [len(pts)]
-    for i in range(len(parts)):
-        a, b = idxs[i], idxs[i + 1]
+    bounds = np.append(np.asarray(parts, dtype=np.intp), len(pts))
+    for a, b in zip(bounds[:-1], bounds[1:]):
         yield pts[a:b]
 
 
-def _parse_rgb_from_record(rec, field_names_lower):
+def _add_lwpolyline(msp, xy, close, dxfattribs):
+    """
+    msp.add_lwpolyline for an (N, 2) array.
+    Fills the entity's packed (x, y, start_width, end_width, bulge) vertex buffer
+    in one step instead of letting ezdxf validate and pack every vertex in Python.
+    """
+    e = msp.add_lwpolyline((), close=close, dxfattribs=dxfattribs)
+    packed = np.zeros((len(xy), e.lwpoints.VERTEX_SIZE), dtype=np.float64)
+    packed[:, :2] = xy
+    e.lwpoints.values = packed
+    return e
+
+
+def _rgb_field_indices(field_names_lower):
+    """
+    Resolve the record positions _parse_rgb_from_record reads, once per file.
+    Returns (rgb_text_idx, (r_idx, g_idx, b_idx), color_idx, aci_idx); missing fields are None.
+    """
+    name_to_idx = {n: i for i, n in enumerate(field_names_lower)}
+
+    def first_idx(*candidates):
+        for c in candidates:
+            idx = name_to_idx.get(c)
+            if idx is not None:
+                return idx
+        return None
+
+    return (
+        name_to_idx.get("rgb_text"),
+        (name_to_idx.get("r"), name_to_idx.get("g"), name_to_idx.get("b")),
+        first_idx("color", "colour", "clr"),
+        first_idx("aci", "autocadcolorindex"),
+    )
+
+
+def _parse_rgb_from_record(rec, rgb_text_idx, rgb_idx, color_idx, aci_idx):
     """
     Extract (R,G,B) from a record using common GIS conventions.
+    Field positions come from _rgb_field_indices.
     Priority:
         1) 'RGB_text' column as 'rgb(R,G,B)'
         2) Integer fields R,G,B
@@ -38,44 +89,31 @@ def _parse_rgb_from_record(rec, field_names_lower):
         5) 'aci' (AutoCAD Color Index)
     Returns (R,G,B) ints in 0..255; defaults to (0,0,0) if not found/invalid.
     """
-    name_to_idx = {n: i for i, n in enumerate(field_names_lower)}
     # 1) RGB_text column
-    rgb_text_idx = name_to_idx.get("rgb_text")
     if rgb_text_idx is not None:
         val = rec[rgb_text_idx]
-        if isinstance(val, str) and val.lower().startswith("rgb(") and val.endswith(")"):
-            try:
-                parts = val[4:-1].split(",")
-                if len(parts) == 3:
-                    R, G, B = int(parts[0]), int(parts[1]), int(parts[2])
-                    if 0 <= R <= 255 and 0 <= G <= 255 and 0 <= B <= 255:
-                        return R, G, B
-            except Exception:
-                pass
+        m = _RGB_TEXT_RE.fullmatch(val) if isinstance(val, str) else None
+        if m:
+            R, G, B = int(m.group(1)), int(m.group(2)), int(m.group(3))
+            if R <= 255 and G <= 255 and B <= 255:
+                return R, G, B
 
     # 2) R,G,B integer columns
-    def get_val(*candidates):
-        for c in candidates:
-            idx = name_to_idx.get(c.lower())
-            if idx is not None:
-                return rec[idx]
-        return None
-
-    r = get_val("r")
-    g = get_val("g")
-    b = get_val("b")
+    r_idx, g_idx, b_idx = rgb_idx
     try:
-        if r is not None and g is not None and b is not None:
-            R = int(r)
-            G = int(g)
-            B = int(b)
-            if 0 <= R <= 255 and 0 <= G <= 255 and 0 <= B <= 255:
-                return R, G, B
+        if r_idx is not None and g_idx is not None and b_idx is not None:
+            r, g, b = rec[r_idx], rec[g_idx], rec[b_idx]
+            if r is not None and g is not None and b is not None:
+                R = int(r)
+                G = int(g)
+                B = int(b)
+                if 0 <= R <= 255 and 0 <= G <= 255 and 0 <= B <= 255:
+                    return R, G, B
     except Exception:
         pass
 
     # 3/4) color string field
-    color_val = get_val("color", "colour", "clr")
+    color_val = rec[color_idx] if color_idx is not None else None
     if isinstance(color_val, str):
         s = color_val.strip()
         # Hex forms
@@ -100,7 +138,7 @@ def _parse_rgb_from_record(rec, field_names_lower):
                 pass
 
     # 5) ACI -> RGB
-    aci_val = get_val("aci", "autocadcolorindex")
+    aci_val = rec[aci_idx] if aci_idx is not None else None
     try:
         if aci_val is not None:
             aci = int(aci_val)
@@ -114,69 +152,69 @@ def _parse_rgb_from_record(rec, field_names_lower):
     return 0, 0, 0
 
 
-def convert_shp_to_dxf(input_dir, output_dir):
+def _convert_one(shp_path, output_dir):
     """
-    Converts all .shp files in input_dir to .dxf format and saves them in output_dir.
-    - Supports POINT, POLYLINE, POLYGON
-    - Applies color and layer from attributes when available
+    Process pool worker: convert one .shp to .dxf in output_dir.
+    Returns the captured console output so the parent can print it in order.
     """
+    filename = os.path.basename(shp_path)
+    dxf_filename = os.path.splitext(filename)[0] + ".dxf"
+    dxf_path = os.path.join(output_dir, dxf_filename)
 
-    # Check input directory
-    if not os.path.isdir(input_dir):
-        print(f"Input directory '{input_dir}' does not exist.")
-        return
-
-    # Ensure output directory
-    if not os.path.isdir(output_dir):
-        os.makedirs(output_dir)
-        print(f"Created output directory '{output_dir}'.")
-
-    for filename in os.listdir(input_dir):
-        if not filename.lower().endswith(".shp"):
-            continue
-
-        shp_path = os.path.join(input_dir, filename)
-        dxf_filename = os.path.splitext(filename)[0] + ".dxf"
-        dxf_path = os.path.join(output_dir, dxf_filename)
-
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
         print(f"Converting '{shp_path}' to '{dxf_path}'...")
 
         try:
             sf = shapefile.Reader(shp_path)
             # Fields: list of tuples; first item is DeletionFlag placeholder
             fields = [f[0] for f in sf.fields[1:]]
+            # Only decode the DBF columns that feed layer and color
+            fields = [f for f in fields if f.lower() in _ATTRIBUTE_FIELDS]
             fields_lower = [f.lower() for f in fields]
+            layer_idx = fields_lower.index("layer") if "layer" in fields_lower else None
+            rgb_fields = _rgb_field_indices(fields_lower)
 
             # New DXF
             doc = ezdxf.new(dxfversion="R2010")
             msp = doc.modelspace()
+            # Lower-cased names already in the layer table (the table is case-insensitive)
+            known_layers = {lay.dxf.name.lower() for lay in doc.layers}
+
+            # Reused for every entity; ezdxf copies the values it is given
+            dxfattribs = {"true_color": 0, "layer": "0"}
 
             # Iterate shape+record pairs to keep attributes aligned
-            for sr in sf.iterShapeRecords():
-                shape = sr.shape
-                rec = sr.record  # behaves like a list-like sequence (values ordered as fields)
+            if fields:
+                # rec behaves like a list-like sequence (values ordered as fields)
+                shape_records = ((sr.shape, sr.record) for sr in sf.iterShapeRecords(fields=fields))
+            else:
+                # Nothing to read from the DBF; skip record decoding entirely
+                shape_records = ((shape, None) for shape in sf.iterShapes())
+            for shape, rec in shape_records:
                 # Layer from attribute if present
                 layer_name = None
                 try:
-                    if "layer" in fields_lower:
-                        layer_name = rec[fields_lower.index("layer")]
+                    if layer_idx is not None:
+                        layer_name = rec[layer_idx]
                         if isinstance(layer_name, bytes):
                             layer_name = layer_name.decode("utf-8", errors="ignore")
                         if not isinstance(layer_name, str):
                             layer_name = str(layer_name)
                         layer_name = layer_name[:255]
-                        if layer_name not in doc.layers:
+                        layer_key = layer_name.lower()
+                        if layer_key not in known_layers:
                             doc.layers.add(layer_name)
+                            known_layers.add(layer_key)
                 except Exception:
                     layer_name = None
 
                 # Color as true_color from attributes
-                R, G, B = _parse_rgb_from_record(rec, fields_lower)
+                R, G, B = _parse_rgb_from_record(rec, *rgb_fields)
                 true_col = ezcolors.rgb2int((int(R), int(G), int(B)))
 
-                dxfattribs = {"true_color": true_col}
-                if layer_name:
-                    dxfattribs["layer"] = layer_name
+                dxfattribs["true_color"] = true_col
+                dxfattribs["layer"] = layer_name or "0"
 
                 geom_type = shape.shapeType
 
@@ -188,13 +226,12 @@ def convert_shp_to_dxf(input_dir, output_dir):
                     is_closed = (geom_type == shapefile.POLYGON)
                     # Handle multipart shapes (rings/parts)
                     for part in _split_parts(shape):
-                        if not part:
+                        if not len(part):
                             continue
                         # Ensure closure for polygons
-                        pts = list(part)
-                        if is_closed and pts[0] != pts[-1]:
-                            pts = pts + [pts[0]]
-                        msp.add_lwpolyline(pts, close=is_closed, dxfattribs=dxfattribs)
+                        if is_closed and not np.array_equal(part[0], part[-1]):
+                            part = np.vstack([part, part[:1]])
+                        _add_lwpolyline(msp, part, is_closed, dxfattribs)
 
                 else:
                     print(
@@ -208,10 +245,44 @@ def convert_shp_to_dxf(input_dir, output_dir):
         except Exception as e:
             print(f"Failed to convert '{filename}'. Error: {e}\n")
 
+    return buf.getvalue()
+
+
+def convert_shp_to_dxf(input_dir, output_dir):
+    """
+    Converts all .shp files in input_dir to .dxf format and saves them in output_dir.
+    - Supports POINT, POLYLINE, POLYGON
+    - Applies color and layer from attributes when available
+    """
+
+    # Check input directory
+    if not os.path.isdir(input_dir):
+        print(f"Input directory '{input_dir}' does not exist.")
+        return
+
+    # Ensure output directory
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+        print(f"Created output directory '{output_dir}'.")
+
+    with os.scandir(input_dir) as it:
+        shp_paths = [
+            entry.path
+            for entry in it
+            if entry.is_file() and entry.name.lower().endswith(".shp")
+        ]
+    if shp_paths:
+        # Each shapefile converts independently; spread them over worker processes
+        with ProcessPoolExecutor(max_workers=min(len(shp_paths), os.cpu_count() or 1)) as ex:
+            sys.stdout.writelines(ex.map(_convert_one, shp_paths, itertools.repeat(output_dir)))
+
     print("All conversions completed.")
 
 
 if __name__ == "__main__":
+    # Console output is block-buffered; conversion logs are flushed in bulk at exit
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False, write_through=False)
     # Define input and output directories
     input_directory = os.path.join(".", "Files2Convert")
     output_directory = os.path.join(".", "ConvertedSHP2DXF")